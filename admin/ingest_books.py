@@ -2,6 +2,13 @@
 ADMIN-ONLY SCRIPT
 Run this script once to ingest medical books into Pinecone.
 This should NOT be accessible to regular users.
+
+Besides the Pinecone vectors, ingestion writes the full chunk text to the
+local chunk store (Config.CHUNK_STORE_PATH, default .cache/chunks.sqlite).
+Pinecone only keeps a short excerpt, so the app refuses to start without
+that file. Either run ingestion on the serving host, or copy the store
+there (into .cache/, or wherever CHUNK_STORE_PATH points) after ingesting.
+.cache/ is gitignored, so a git-based deploy will not carry it.
 """
 
 import sys
@@ -12,11 +19,33 @@ sys.path.append(str(Path(__file__).parent.parent))
 from loaders.pdf_loader import StreamingPDFLoader
 from embeddings.embedder import ChunkEmbedder
 from vectorstore.pinecone_db import PineconeDB
+from vectorstore.chunk_store import ChunkStore
+from rag.question_cache import bump_corpus_version
 from utils.config import Config
 import argparse
+import queue
+import threading
+from itertools import islice
 from tqdm import tqdm
 
 
+def _upload_worker(vectorstore: PineconeDB, upload_queue: queue.Queue, errors: list):
+    """
+    Upsert vector batches from the queue until the None sentinel arrives.
+    After a failure the remaining batches are drained so the producer never blocks.
+    """
+    while True:
+        vectors = upload_queue.get()
+        if vectors is None:
+            return
+        if errors:
+            continue
+        try:
+            vectorstore.upsert_vectors(vectors)
+        except Exception as e:
+            errors.append(e)
+
+
 def ingest_book(pdf_path: str, book_name: str):
     """
     Ingest a single medical book into Pinecone.
@@ -32,34 +61,52 @@ def ingest_book(pdf_path: str, book_name: str):
     loader = StreamingPDFLoader()
     embedder = ChunkEmbedder()
     vectorstore = PineconeDB()
+    chunk_store = ChunkStore()
 
     try:
-        # Step 1: Load and stream PDF
-        print("\n📖 Loading PDF...")
-        pages = loader.load_pdf(pdf_path)
-        print(f"✅ Loaded {len(pages)} pages")
-
-        # Step 2: Create chunks
-        print("\n✂️ Creating chunks...")
+        # Pages, chunks and embeddings stream through in lockstep so only
+        # one batch is held in memory at a time
+        print("\n📖 Streaming PDF → chunks → embeddings → Pinecone...")
+        pages = loader.iter_pages(pdf_path)
         chunks = embedder.create_chunks(pages, book_name)
-        print(f"✅ Created {len(chunks)} chunks")
-
-        # Step 3: Generate embeddings in batches
-        print("\n🧮 Generating embeddings...")
-        all_vectors = []
 
+        # Upload on a background thread so embedding overlaps Pinecone round-trips
+        upload_queue = queue.Queue(maxsize=4)
+        upload_errors = []
+        uploader = threading.Thread(
+            target=_upload_worker,
+            args=(vectorstore, upload_queue, upload_errors),
+            daemon=True
+        )
+        uploader.start()
+
+        total_vectors = 0
         batch_size = Config.BATCH_SIZE
-        for i in tqdm(range(0, len(chunks), batch_size), desc="Embedding batches"):
-            batch = chunks[i:i + batch_size]
-            vectors = embedder.embed_batch(batch)
-            all_vectors.extend(vectors)
+        try:
+            with tqdm(desc="Embedding batches", unit="batch") as progress:
+                while not upload_errors:
+                    batch = list(islice(chunks, batch_size))
+                    if not batch:
+                        break
+
+                    vectors = embedder.embed_batch(batch)
+                    chunk_store.put_many(batch)
+                    upload_queue.put(vectors)
+
+                    total_vectors += len(vectors)
+                    progress.update(1)
+        finally:
+            upload_queue.put(None)
+            uploader.join()
 
-        print(f"✅ Generated {len(all_vectors)} embeddings")
+        if upload_errors:
+            raise upload_errors[0]
 
-        # Step 4: Upload to Pinecone
-        print("\n☁️ Uploading to Pinecone...")
-        vectorstore.upsert_vectors(all_vectors)
-        print("✅ Upload complete!")
+        # Invalidate answers cached against the previous corpus
+        bump_corpus_version()
+
+        print(f"✅ Embedded and uploaded {total_vectors} chunks "
+              f"({embedder.duplicate_chunks} duplicate chunks skipped)")
 
         # Step 5: Verify
         stats = vectorstore.get_index_stats()
@@ -71,12 +118,24 @@ def ingest_book(pdf_path: str, book_name: str):
         print(f"\n❌ Error during ingestion: {str(e)}")
         raise
 
+    finally:
+        embedder.close()
+        chunk_store.close()
+
 
 def main():
-    parser = argparse.ArgumentParser(description="Ingest medical books into Pinecone")
+    parser = argparse.ArgumentParser(
+        description="Ingest medical books into Pinecone",
+        epilog=f"Full chunk text is written to {Config.CHUNK_STORE_PATH}; "
+               "the serving host needs this file as well as Pinecone."
+    )
     parser.add_argument("--pdf", required=True, help="Path to PDF file")
     parser.add_argument("--name", required=True, help="Book name for metadata")
-    parser.add_argument("--rebuild", action="store_true", help="Rebuild index from scratch")
+    parser.add_argument(
+        "--rebuild",
+        action="store_true",
+        help="Recreate the index from scratch (required after changing PINECONE_METRIC)"
+    )
 
     args = parser.parse_args()
 
@@ -87,8 +146,9 @@ def main():
         print("⚠️ Rebuilding index from scratch...")
         response = input("This will delete all existing vectors. Continue? (yes/no): ")
         if response.lower() == 'yes':
-            vectorstore.delete_all()
-            print("✅ Index cleared")
+            # Recreate rather than clear so the index picks up the configured metric
+            vectorstore.recreate_index()
+            print("✅ Index rebuilt")
         else:
             print("❌ Cancelled")
             return
@@ -101,4 +161,7 @@ if __name__ == "__main__":
     main()
 """bash
 python admin/ingest_books.py --pdf /path/to/surgery.pdf --name "Bailey Surgery 27th Edition"
+
+# Ingested elsewhere? Ship the chunk store (and corpus version marker) with the app:
+scp .cache/chunks.sqlite .cache/corpus_version serving-host:/path/to/app/.cache/
 """
\ No newline at end of file
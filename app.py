@@ -6,6 +6,7 @@ Students can have multi-turn conversations with AI medical assistant
 import streamlit as st
 from rag.retriever import RAGRetriever
 from rag.llm_chain import LLMChain
+from rag.question_cache import QuestionCache
 from utils.config import Config
 import time
 from datetime import datetime
@@ -133,6 +134,11 @@ def initialize_system():
         st.error(f"Failed to initialize system: {str(e)}")
         return None, None
 
+@st.cache_resource
+def get_question_cache():
+    """Answer cache shared across sessions (cached)"""
+    return QuestionCache()
+
 # Initialize session state for chat history
 if 'messages' not in st.session_state:
     st.session_state.messages = []
@@ -152,6 +158,21 @@ def format_message(role, content, references=None, timestamp=None):
 
         return f'<div class="assistant-message">🤖 <strong>Medical AI:</strong><br/>{content}{ref_html}</div>'
 
+def generate_response(llm_chain, question, retrieved_docs, placeholder, use_retrieval=True):
+    """Generate an answer, streaming partial text into the placeholder when enabled"""
+    if not Config.STREAMING_ENABLED:
+        return llm_chain.generate_answer(question, retrieved_docs, use_retrieval)
+
+    response = None
+    partial = ""
+    for part in llm_chain.generate_answer_stream(question, retrieved_docs, use_retrieval):
+        if isinstance(part, dict):
+            response = part
+        else:
+            partial += part
+            placeholder.markdown(format_message("assistant", partial), unsafe_allow_html=True)
+    return response
+
 def main():
     # Sidebar
     with st.sidebar:
@@ -261,19 +282,49 @@ def main():
             try:
                 start_time = time.time()
 
-                # Retrieve relevant documents
-                retrieved_docs = retriever.retrieve(user_input)
-
-                if not retrieved_docs:
-                    response_text = "I couldn't find relevant information in the medical textbooks for this question. Could you rephrase or ask something else?"
+                question_cache = get_question_cache()
+                question_cache.check_version()
+
+                # Greetings and near-empty input: answer directly, no retrieval
+                use_retrieval = retriever.needs_retrieval(user_input)
+
+                cached = None
+                query_vector = None
+                if use_retrieval:
+                    # Exact repeat: no embedding, retrieval or LLM call needed
+                    cached = question_cache.lookup_exact(user_input)
+                    if cached is None:
+                        query_vector = retriever.embed_query(user_input)
+                        cached = question_cache.lookup(query_vector)
+
+                if not use_retrieval:
+                    response = generate_response(
+                        llm_chain, user_input, [], thinking_placeholder, use_retrieval=False
+                    )
+                    response_text = response['content']
                     references = []
+                elif cached is not None:
+                    response_text = cached['content']
+                    references = cached.get('references', [])
                 else:
-                    # Generate user-focused response
-                    response = llm_chain.generate_answer(user_input, retrieved_docs)
-
-                    # Get conversational content
-                    response_text = response['content']
-                    references = response.get('references', [])
+                    # Retrieve relevant documents
+                    retrieved_docs = retriever.retrieve(user_input, query_vector=query_vector)
+
+                    if not retrieved_docs:
+                        response_text = "I couldn't find relevant information in the medical textbooks for this question. Could you rephrase or ask something else?"
+                        references = []
+                    else:
+                        # Generate user-focused response
+                        response = generate_response(
+                            llm_chain, user_input, retrieved_docs, thinking_placeholder
+                        )
+
+                        # Get conversational content
+                        response_text = response['content']
+                        references = response.get('references', [])
+
+                        if not response.get('error'):
+                            question_cache.add(user_input, query_vector, response)
 
                 query_time = time.time() - start_time
 
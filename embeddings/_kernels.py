@@ -0,0 +1,35 @@
+"""
+Vector similarity kernels shared by the caches and retrieval.
+"""
+
+from typing import Tuple
+
+import numpy as np
+
+
+def cos_sim_topk(q: np.ndarray, mat: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Find the rows of mat most similar to q by cosine similarity.
+
+    Args:
+        q: Query vector of shape (D,)
+        mat: Candidate matrix of shape (N, D)
+        k: Number of rows to return
+
+    Returns:
+        (indices, similarities) of the top-k rows, best first
+    """
+    q = np.asarray(q, dtype=np.float32)
+    mat = np.asarray(mat, dtype=np.float32)
+    k = min(k, len(mat))
+    if k <= 0:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float32)
+
+    # One gemv plus row norms; zero vectors score 0 instead of NaN
+    norms = np.linalg.norm(mat, axis=1) * np.linalg.norm(q)
+    sims = (mat @ q) / np.where(norms == 0, 1, norms)
+
+    # Partial selection is O(N); only the k winners are sorted
+    idx = np.argpartition(-sims, k - 1)[:k]
+    idx = idx[np.argsort(-sims[idx])]
+    return idx, sims[idx]
@@ -0,0 +1,90 @@
+"""
+Micro-batching front end for query embeddings.
+Queries arriving from concurrent sessions within a short window are
+coalesced into a single forward pass.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import List, Optional
+
+from embeddings.embedder import ChunkEmbedder
+from utils.config import Config
+
+
+class BatchedEmbedder:
+    """
+    Wraps a ChunkEmbedder with a background thread that flushes pending
+    queries every window_ms or as soon as max_batch are queued.
+    """
+
+    def __init__(self, embedder: ChunkEmbedder, window_ms: Optional[float] = None,
+                 max_batch: Optional[int] = None):
+        """
+        Args:
+            embedder: Embedder that runs the model
+            window_ms: How long to wait for more queries (default: Config.QUERY_BATCH_WINDOW_MS)
+            max_batch: Flush immediately at this many queries (default: Config.QUERY_BATCH_MAX)
+        """
+        self.embedder = embedder
+        self.window = (window_ms if window_ms is not None else Config.QUERY_BATCH_WINDOW_MS) / 1000
+        self.max_batch = max_batch or Config.QUERY_BATCH_MAX
+
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def embed_query(self, query: str) -> List[float]:
+        """Embed a query, blocking until its batch has been encoded"""
+        future = Future()
+        self._queue.put((query, future))
+        return future.result()
+
+    def close(self):
+        """Stop the background thread once pending queries are served"""
+        self._queue.put(None)
+        self._worker.join()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+
+            batch = [item]
+            deadline = time.monotonic() + self.window
+            stop = False
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+
+            self._flush(batch)
+            if stop:
+                return
+
+    def _flush(self, batch: List):
+        queries = [query for query, _ in batch]
+        try:
+            # A lone query takes the embedder's direct single-text path
+            if len(queries) == 1:
+                vectors = [self.embedder.embed_query(queries[0])]
+            else:
+                vectors = self.embedder.embed_queries(queries)
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        for (_, future), vector in zip(batch, vectors):
+            future.set_result(vector)
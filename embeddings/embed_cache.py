@@ -0,0 +1,70 @@
+"""
+Persistent on-disk embedding cache.
+Stores vectors keyed by a SHA-256 of (model name and precision, chunk text)
+so re-ingesting an unchanged book skips the embedding model entirely.
+"""
+
+import hashlib
+from typing import Dict, List
+
+import numpy as np
+
+from utils.config import Config
+from utils.sqlite_store import SQLiteStore
+
+
+class EmbeddingCache(SQLiteStore):
+    """
+    SQLite-backed cache of float32 embedding vectors.
+    """
+
+    def __init__(self, db_path: str = None, model_name: str = None):
+        """
+        Args:
+            db_path: Path to SQLite file (default: Config.EMBEDDING_CACHE_PATH)
+            model_name: Embedding model (and precision) mixed into every key
+        """
+        self.model_name = model_name or Config.EMBEDDING_MODEL
+        super().__init__(
+            db_path or Config.EMBEDDING_CACHE_PATH,
+            ["CREATE TABLE IF NOT EXISTS embeddings ("
+             "hash BLOB PRIMARY KEY, model TEXT, dim INT, vec BLOB)"],
+            "Embedding cache"
+        )
+
+    def key(self, text: str) -> bytes:
+        """Cache key for a text under the current model"""
+        return hashlib.sha256((self.model_name + "\x00" + text).encode()).digest()
+
+    def get_many(self, keys: List[bytes]) -> Dict[bytes, np.ndarray]:
+        """
+        Fetch cached vectors.
+
+        Args:
+            keys: Cache keys from key()
+
+        Returns:
+            Mapping of key to float32 vector for every cache hit
+        """
+        rows = self._select_in(
+            "SELECT hash, vec FROM embeddings WHERE hash IN ({placeholders})", keys
+        )
+        return {key: np.frombuffer(vec, dtype=np.float32) for key, vec in rows}
+
+    def put_many(self, keys: List[bytes], vectors: np.ndarray):
+        """
+        Store freshly computed vectors.
+
+        Args:
+            keys: Cache keys, aligned with vectors
+            vectors: Array of shape (len(keys), dim)
+        """
+        if not keys:
+            return
+
+        vectors = np.asarray(vectors, dtype=np.float32)
+        dim = vectors.shape[1]
+        self._write_many(
+            "INSERT OR IGNORE INTO embeddings (hash, model, dim, vec) VALUES (?, ?, ?, ?)",
+            [(key, self.model_name, dim, vec.tobytes()) for key, vec in zip(keys, vectors)]
+        )
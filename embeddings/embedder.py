@@ -4,11 +4,18 @@ Uses semantic chunking with overlap for better context preservation.
 """
 
 from sentence_transformers import SentenceTransformer
-from typing import List, Dict
+from typing import List, Dict, Iterable, Iterator, Union
 from utils.config import Config
+from embeddings.embed_cache import EmbeddingCache
 import numpy as np
+import torch
+import torch.nn.functional as F
+import hashlib
 import re
 
+# Paragraph break: a newline, optional whitespace-only lines, another newline
+_PARA_RE = re.compile(r"\n\s*\n")
+
 
 class ChunkEmbedder:
     """
@@ -19,22 +26,91 @@ class ChunkEmbedder:
         """Initialize embedding model"""
         print(f"Loading embedding model: {Config.EMBEDDING_MODEL}")
         self.model = SentenceTransformer(Config.EMBEDDING_MODEL)
-        self.chunk_size = Config.CHUNK_SIZE
-        self.chunk_overlap = Config.CHUNK_OVERLAP
+        self.device = self.model.device
+        self.tokenizer = self.model.tokenizer
+        self.dimension = self.model.get_sentence_embedding_dimension()
+
+        # Lower precision: FP16 tensor cores on GPU, int8 (VNNI) linear layers on CPU
+        self._quantized = False
+        self.precision = "fp32"
+        if self.device.type == "cuda":
+            self.model.half()
+            self.precision = "fp16"
+        elif Config.EMBEDDING_QUANTIZE_CPU:
+            torch.quantization.quantize_dynamic(
+                self.model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True
+            )
+            self._quantized = True
+            self.precision = "int8"
+
+        self.model.eval()
+        if self.device.type == "cuda" and Config.EMBEDDING_COMPILE:
+            self._compile_model()
+
+        # Single-query fast path calls the HF model directly; only valid for
+        # the plain Transformer -> mean Pooling (-> Normalize) pipeline
+        self._fwd = self.model[0].auto_model
+        modules = [type(module).__name__ for module in self.model]
+        self._fast_query = False
+        if modules in (["Transformer", "Pooling"], ["Transformer", "Pooling", "Normalize"]):
+            pooling = self.model[1]
+            self._fast_query = bool(
+                pooling.pooling_mode_mean_tokens
+                and not (pooling.pooling_mode_cls_token or pooling.pooling_mode_max_tokens
+                         or pooling.pooling_mode_mean_sqrt_len_tokens)
+            )
+
+        # Never build chunks longer than the model will actually read
+        max_tokens = self.model.max_seq_length - self.tokenizer.num_special_tokens_to_add()
+        self.chunk_size = min(Config.CHUNK_SIZE, max_tokens)
+        self.chunk_overlap = min(Config.CHUNK_OVERLAP, self.chunk_size // 2)
 
-    def create_chunks(self, pages: List[Dict], book_name: str) -> List[Dict]:
+        # Large batches keep the GPU busy; unquantized CPU bulk encoding is spread over
+        # a process pool that is started on first use (ingestion only)
+        self._batch_size = 256 if self.device.type == "cuda" else 64
+        self._pool = None
+        self._cache = None
+        self.duplicate_chunks = 0
+
+    def _compile_model(self):
+        """
+        Compile the transformer forward pass with TorchInductor and warm it up
+        so the first user query does not pay compilation latency.
+        Falls back to eager execution if compilation is unavailable or fails.
+        """
+        major, minor = (int(v) for v in torch.__version__.split(".")[:2])
+        if (major, minor) < (2, 1):
+            return
+
+        transformer = self.model[0]
+        eager_model = transformer.auto_model
+        try:
+            torch.set_float32_matmul_precision("high")
+            # dynamic=True: encode() pads to the longest text in each batch, so
+            # static shapes would recompile for every new sequence length
+            transformer.auto_model = torch.compile(eager_model, dynamic=True)
+            self.model.encode(["warmup"] * 2, batch_size=2, show_progress_bar=False)
+        except Exception as e:
+            print(f"torch.compile unavailable, using eager model: {e}")
+            transformer.auto_model = eager_model
+
+    def create_chunks(self, pages: Iterable[Dict], book_name: str) -> Iterator[Dict]:
         """
         Create overlapping chunks from pages.
+        Repeated chunk text (running headers, copyright lines) is only
+        yielded the first time; skipped copies are counted in
+        self.duplicate_chunks.
 
         Args:
-            pages: List of page dictionaries
+            pages: Iterable of page dictionaries (e.g. StreamingPDFLoader.iter_pages)
             book_name: Name of the book
 
-        Returns:
-            List of chunk dictionaries with metadata
+        Yields:
+            Chunk dictionaries with metadata, one at a time
         """
-        chunks = []
         chunk_id = 0
+        seen = set()
+        self.duplicate_chunks = 0
 
         for page in pages:
             page_text = page['text']
@@ -44,15 +120,23 @@ class ChunkEmbedder:
             paragraphs = self._split_into_paragraphs(page_text)
 
             for para_num, paragraph in enumerate(paragraphs, 1):
-                # Skip very short paragraphs
-                if len(paragraph.split()) < 20:
+                # Skip very short paragraphs (< ~20 words); counting separators
+                # avoids allocating a word list per paragraph
+                if paragraph.count(" ") + paragraph.count("\n") < 19:
                     continue
 
                 # Create chunks with overlap
                 para_chunks = self._chunk_text(paragraph)
 
                 for chunk_text in para_chunks:
-                    chunks.append({
+                    digest = hashlib.blake2b(chunk_text.encode(), digest_size=16).digest()
+                    if digest in seen:
+                        self.duplicate_chunks += 1
+                        chunk_id += 1
+                        continue
+                    seen.add(digest)
+
+                    yield {
                         'id': f"{book_name}_page{page_num}_para{para_num}_chunk{chunk_id}",
                         'text': chunk_text,
                         'metadata': {
@@ -61,37 +145,42 @@ class ChunkEmbedder:
                             'paragraph': para_num,
                             'chunk_id': chunk_id
                         }
-                    })
+                    }
                     chunk_id += 1
 
-        return chunks
-
     def _split_into_paragraphs(self, text: str) -> List[str]:
         """Split text into paragraphs"""
-        # Split on double newlines or multiple spaces
-        paragraphs = re.split(r'\n\n+|\n\s+\n', text)
-        return [p.strip() for p in paragraphs if p.strip()]
+        paragraphs = (p.strip() for p in _PARA_RE.split(text))
+        return [p for p in paragraphs if p]
 
     def _chunk_text(self, text: str) -> List[str]:
         """
         Chunk text with overlap based on token count.
-        Uses approximate token count (words * 1.3)
+        Tokenizes once with the model's own tokenizer and slices windows
+        back out of the original text via the offset mapping.
         """
-        words = text.split()
-        chunks = []
+        encoding = self.tokenizer(
+            text,
+            return_offsets_mapping=True,
+            add_special_tokens=False,
+            verbose=False
+        )
+        offsets = encoding['offset_mapping']
+        num_tokens = len(encoding['input_ids'])
 
-        # Approximate tokens (1 token ≈ 0.75 words)
-        words_per_chunk = int(self.chunk_size * 0.75)
-        words_overlap = int(self.chunk_overlap * 0.75)
+        chunks = []
+        stride = max(1, self.chunk_size - self.chunk_overlap)
 
         start = 0
-        while start < len(words):
-            end = start + words_per_chunk
-            chunk_words = words[start:end]
-            chunks.append(' '.join(chunk_words))
+        while start < num_tokens:
+            end = min(start + self.chunk_size, num_tokens)
+            chunks.append(text[offsets[start][0]:offsets[end - 1][1]])
+
+            if end == num_tokens:
+                break
 
             # Move start by (chunk_size - overlap)
-            start += (words_per_chunk - words_overlap)
+            start += stride
 
         return chunks
 
@@ -107,30 +196,111 @@ class ChunkEmbedder:
         """
         texts = [chunk['text'] for chunk in chunks]
 
-        # Generate embeddings
-        embeddings = self.model.encode(
-            texts,
-            batch_size=32,
-            show_progress_bar=False,
-            convert_to_numpy=True
-        )
+        # Look up previously embedded texts (opened lazily, ingestion only)
+        if self._cache is None:
+            # Vectors from different precisions differ slightly; never mix them
+            self._cache = EmbeddingCache(model_name=f"{Config.EMBEDDING_MODEL}@{self.precision}")
+        keys = [self._cache.key(text) for text in texts]
+        cached = self._cache.get_many(keys)
+
+        # One contiguous float32 buffer for the whole batch
+        embeddings = np.empty((len(texts), self.dimension), dtype=np.float32)
+        misses = []
+        for i, key in enumerate(keys):
+            vec = cached.get(key)
+            if vec is None:
+                misses.append(i)
+            else:
+                embeddings[i] = vec
+
+        # Generate embeddings only for cache misses
+        if misses:
+            fresh = self._encode([texts[i] for i in misses], bulk=True)
+            embeddings[misses] = fresh
+            self._cache.put_many([keys[i] for i in misses], fresh)
 
-        # Format for Pinecone
+        # Format for Pinecone (rows stay numpy views; the client converts them on send)
         vectors = []
         for i, chunk in enumerate(chunks):
             vectors.append({
                 'id': chunk['id'],
-                'values': embeddings[i].tolist(),
+                'values': embeddings[i],
                 'metadata': {
                     **chunk['metadata'],
-                    'text': chunk['text'][:1000]  # Pinecone metadata limit
+                    # Short excerpt only; full text lives in ChunkStore
+                    'excerpt': chunk['text'][:120]
                 }
             })
 
         return vectors
 
     def embed_query(self, query: str) -> List[float]:
-        """Generate embedding for a query"""
-        embedding = self.model.encode(query, convert_to_numpy=True)
-        return embedding.tolist()
+        """
+        Generate embedding for a query.
+        Skips encode()'s batching, sorting and progress-bar bookkeeping by
+        running tokenizer -> model -> mean pooling -> normalize directly.
+        """
+        if not self._fast_query:
+            return self._encode(query).tolist()
+
+        encoded = self.tokenizer(
+            query.strip(),
+            truncation=True,
+            max_length=self.model.max_seq_length,
+            return_tensors="pt"
+        ).to(self.device)
+
+        with torch.inference_mode():
+            token_embeddings = self._fwd(**encoded).last_hidden_state
+            mask = encoded['attention_mask'].unsqueeze(-1).to(token_embeddings.dtype)
+            embedding = (token_embeddings * mask).sum(1) / mask.sum(1).clamp(min=1e-9)
+            embedding = F.normalize(embedding.float(), dim=1)
+
+        return embedding[0].cpu().numpy().tolist()
+
+    def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """Generate embeddings for several queries in one forward pass"""
+        return self._encode(queries).tolist()
+
+    def _encode(self, texts: Union[str, List[str]], bulk: bool = False) -> np.ndarray:
+        """
+        Run the model and return unit-length float32 vectors regardless of model precision.
+
+        Args:
+            texts: A single text or a list of texts
+            bulk: Use the CPU process pool (large ingestion batches only)
+        """
+        # A quantized model can't be shipped to spawned workers; it encodes in-process
+        if (bulk and self.device.type == "cpu" and not self._quantized
+                and Config.EMBEDDING_CPU_PROCESSES > 1):
+            if self._pool is None:
+                self._pool = self.model.start_multi_process_pool(
+                    ["cpu"] * Config.EMBEDDING_CPU_PROCESSES
+                )
+            embeddings = self.model.encode_multi_process(texts, self._pool, batch_size=64)
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings = embeddings / np.where(norms == 0, 1, norms)
+        else:
+            embeddings = self.model.encode(
+                texts,
+                batch_size=self._batch_size,
+                show_progress_bar=False,
+                convert_to_numpy=True,
+                normalize_embeddings=True
+            )
+        return embeddings.astype(np.float32, copy=False)
+
+    def close(self):
+        """Stop the CPU process pool and close the embedding cache"""
+        if self._pool is not None:
+            SentenceTransformer.stop_multi_process_pool(self._pool)
+            self._pool = None
+        if self._cache is not None:
+            self._cache.close()
+            self._cache = None
 
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
@@ -4,22 +4,71 @@ Handles PDFs up to 20,000 pages without loading entire file into memory.
 """
 
 import fitz  # PyMuPDF
-from typing import List, Dict
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+from itertools import islice
+from typing import List, Dict, Iterator, Optional, Tuple
 from pathlib import Path
-import gc
+import multiprocessing
+import os
+
+# Plain text for embedding: join hyphenated line breaks, expand ligatures,
+# clip to the page; no whitespace preservation
+_TEXT_FLAGS = fitz.TEXT_DEHYPHENATE | fitz.TEXT_MEDIABOX_CLIP
+
+
+def _page_text(page) -> str:
+    """Extract page text without the geometric reading-order sort"""
+    return page.get_text("text", flags=_TEXT_FLAGS, sort=False)
+
+
+def _open_pdf(pdf_path) -> fitz.Document:
+    """
+    Open a PDF by path. MuPDF then reads the file through a seekable stream
+    and only touches the objects of pages actually loaded, leaving the rest
+    of the file to the OS page cache. Opening from a bytes/mmap stream would
+    instead copy the whole file into a Python buffer up front.
+    """
+    return fitz.open(str(pdf_path), filetype="pdf")
+
+
+def _init_worker():
+    """Silence MuPDF's stderr chatter in extraction workers"""
+    fitz.TOOLS.mupdf_display_errors(False)
+
+
+def _extract_range(pdf_path: str, start: int, stop: int) -> List[Tuple[int, str]]:
+    """
+    Extract text for pages [start, stop) in a worker process.
+    Documents are not picklable, so each worker opens its own.
+    """
+    doc = _open_pdf(pdf_path)
+    try:
+        return [(page_num, _page_text(doc[page_num])) for page_num in range(start, stop)]
+    finally:
+        doc.close()
 
 
 class StreamingPDFLoader:
     """
     Streams PDF pages one at a time to avoid memory overload.
+    Text extraction is spread across worker processes for large PDFs.
     """
 
-    def __init__(self, max_size_mb: int = 500):
+    def __init__(self, max_size_mb: int = 500, workers: Optional[int] = None,
+                 pages_per_task: int = 64):
         """
         Args:
             max_size_mb: Maximum PDF size in MB
+            workers: Extraction processes (default: CPU count, 1 disables)
+            pages_per_task: Pages extracted per worker task
         """
         self.max_size_mb = max_size_mb
+        self.workers = workers or os.cpu_count() or 1
+        self.pages_per_task = pages_per_task
+
+        # Malformed textbook PDFs can emit thousands of recoverable warnings
+        fitz.TOOLS.mupdf_display_errors(False)
 
     def load_pdf(self, pdf_path: str) -> List[Dict]:
         """
@@ -31,6 +80,18 @@ class StreamingPDFLoader:
         Returns:
             List of page dictionaries with text and metadata
         """
+        return list(self.iter_pages(pdf_path))
+
+    def iter_pages(self, pdf_path: str) -> Iterator[Dict]:
+        """
+        Stream pages of a PDF one at a time.
+
+        Args:
+            pdf_path: Path to PDF file
+
+        Yields:
+            Page dictionaries with text and metadata
+        """
         pdf_path = Path(pdf_path)
 
         # Validate file
@@ -41,52 +102,91 @@ class StreamingPDFLoader:
         if file_size_mb > self.max_size_mb:
             raise ValueError(f"PDF too large: {file_size_mb:.1f}MB (max: {self.max_size_mb}MB)")
 
-        pages = []
-
         try:
-            # Open PDF
-            doc = fitz.open(pdf_path)
-            total_pages = len(doc)
+            with _open_pdf(pdf_path) as doc:
+                total_pages = len(doc)
 
             print(f"Processing {total_pages} pages...")
 
-            # Stream pages
-            for page_num in range(total_pages):
-                page = doc[page_num]
-
-                # Extract text
-                text = page.get_text()
+            if self.workers > 1 and total_pages > self.pages_per_task:
+                page_texts = self._extract_parallel(str(pdf_path), total_pages)
+            else:
+                page_texts = self._extract_serial(str(pdf_path), total_pages)
 
+            for page_num, text in page_texts:
                 # Skip empty pages
                 if not text.strip():
                     continue
 
                 # Create page object
-                pages.append({
+                yield {
                     'page_number': page_num + 1,
                     'text': text,
                     'char_count': len(text)
-                })
-
-                # Periodic garbage collection for large PDFs
-                if page_num % 100 == 0:
-                    gc.collect()
-
-            doc.close()
+                }
 
         except Exception as e:
             raise Exception(f"Error loading PDF: {str(e)}")
 
-        return pages
+    def _extract_serial(self, pdf_path: str, total_pages: int) -> Iterator[Tuple[int, str]]:
+        """Extract page text in this process"""
+        doc = _open_pdf(pdf_path)
+        try:
+            for page_num in range(total_pages):
+                page = doc[page_num]
+                text = _page_text(page)
+                # Drop the Page now; it pins C-side memory until released
+                del page
+
+                # Bound MuPDF's resource store (fonts, images) without a Python GC pass
+                if page_num % 512 == 511:
+                    fitz.TOOLS.store_shrink(100)
+
+                yield page_num, text
+        finally:
+            doc.close()
+
+    def _extract_parallel(self, pdf_path: str, total_pages: int) -> Iterator[Tuple[int, str]]:
+        """
+        Extract page text across worker processes, in page order.
+        Only a bounded window of page ranges is in flight so extraction
+        never runs far ahead of the consumer.
+        """
+        ranges = iter(
+            (start, min(start + self.pages_per_task, total_pages))
+            for start in range(0, total_pages, self.pages_per_task)
+        )
+
+        # Spawn, not fork: by now the caller may hold threads and CUDA state
+        with ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker
+        ) as executor:
+            pending = deque(
+                executor.submit(_extract_range, pdf_path, start, stop)
+                for start, stop in islice(ranges, self.workers * 2)
+            )
+            try:
+                while pending:
+                    results = pending.popleft().result()
+
+                    next_range = next(ranges, None)
+                    if next_range is not None:
+                        pending.append(executor.submit(_extract_range, pdf_path, *next_range))
+
+                    yield from results
+            finally:
+                for future in pending:
+                    future.cancel()
 
     def extract_metadata(self, pdf_path: str) -> Dict:
         """Extract PDF metadata"""
-        doc = fitz.open(pdf_path)
-        metadata = {
-            'title': doc.metadata.get('title', ''),
-            'author': doc.metadata.get('author', ''),
-            'pages': len(doc),
-            'file_size': Path(pdf_path).stat().st_size
-        }
-        doc.close()
+        with _open_pdf(pdf_path) as doc:
+            metadata = {
+                'title': doc.metadata.get('title', ''),
+                'author': doc.metadata.get('author', ''),
+                'pages': len(doc),
+                'file_size': Path(pdf_path).stat().st_size
+            }
         return metadata
@@ -0,0 +1,29 @@
+"""
+Process-wide API clients.
+Building a Groq or Pinecone client sets up an HTTP session and TLS context,
+so every LLMChain and PineconeDB shares one pooled instance instead.
+"""
+
+from functools import lru_cache
+
+import httpx
+from groq import Groq
+from pinecone.grpc import PineconeGRPC
+
+from utils.config import Config
+
+
+@lru_cache(maxsize=None)
+def get_groq_client() -> Groq:
+    """Shared Groq client with a keep-alive HTTP/2 connection pool"""
+    http_client = httpx.Client(
+        limits=httpx.Limits(max_connections=64, max_keepalive_connections=32),
+        http2=True
+    )
+    return Groq(api_key=Config.require_key("GROQ_API_KEY"), http_client=http_client)
+
+
+@lru_cache(maxsize=None)
+def get_pinecone_client() -> PineconeGRPC:
+    """Shared Pinecone client; its indexes talk gRPC on the data plane"""
+    return PineconeGRPC(api_key=Config.require_key("PINECONE_API_KEY"))
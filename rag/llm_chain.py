@@ -3,9 +3,54 @@ LLM chain for generating answers using Groq.
 User-focused answers powered by book knowledge.
 """
 
-from groq import Groq
-from typing import List, Dict
+from groq import AsyncGroq
+from typing import List, Dict, Iterator, Tuple, Union
+from rag._clients import get_groq_client
 from utils.config import Config
+from functools import lru_cache
+import asyncio
+import io
+import json
+import tiktoken
+
+
+@lru_cache(maxsize=1)
+def _get_encoder():
+    """cl100k_base as a local stand-in for the Llama tokenizer (None if unavailable)"""
+    try:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        print(f"Token counter unavailable, estimating from length: {e}")
+        return None
+
+
+def _shingles(text: str) -> frozenset:
+    """Word 3-gram shingles of the whole (lowercased) text"""
+    words = text.lower().split()
+    return frozenset(' '.join(words[i:i + 3]) for i in range(max(len(words) - 2, 1)))
+
+
+def _jaccard(a: frozenset, b: frozenset) -> float:
+    """
+    Shingle-set similarity; a few-word edit of a chunk stays well above 0.8.
+
+    >>> base = ' '.join(f'w{i}' for i in range(190))
+    >>> edited = base.replace('w50 ', 'x ').replace('w120 ', 'y ').replace('w170 ', 'z ')
+    >>> round(_jaccard(_shingles(base), _shingles(edited)), 2)
+    0.91
+    """
+    if not a or not b:
+        return 0.0
+    inter = len(a & b)
+    return inter / (len(a) + len(b) - inter)
+
+
+def _count_tokens(text: str) -> int:
+    encoder = _get_encoder()
+    if encoder is None:
+        return len(text) // 3
+    return len(encoder.encode(text, disallowed_special=()))
+
 
 class LLMChain:
     """
@@ -13,31 +58,54 @@ class LLMChain:
     Answers user questions directly using book data as knowledge base.
     """
 
+    # Prompt text is defined once and kept byte-stable across requests so
+    # Groq's prefix caching can reuse the prefill for the shared prefix
+    SYSTEM_PROMPT = "You are a friendly medical AI assistant helping students learn. Answer their questions naturally and conversationally using textbook knowledge. Focus on what they actually asked."
+
+    TASK_PREAMBLE = """You are a helpful medical AI assistant. A student has asked you a question, and you have access to relevant medical textbook content to help answer it.
+
+Your task: Answer the student's question directly and conversationally, using the textbook content as your knowledge base.
+
+Guidelines:
+- Focus on answering EXACTLY what the student asked
+- Use a natural, conversational tone (like ChatGPT)
+- Draw facts and information from the textbook content below
+- If the student asks "what is X", explain what X is
+- If they ask "how to treat Y", explain treatment
+- If they ask "why does Z happen", explain the mechanism
+- Be helpful and educational, not rigid
+- If the textbook doesn't have the specific info they need, say so politely"""
+
+    DIRECT_PREAMBLE = """You are a helpful medical AI assistant. The student's message below is small talk or too short to need the medical textbooks, so no textbook content was retrieved.
+
+Reply briefly and naturally. If it seems they want medical information, invite them to ask a specific question."""
+
+    FORMAT_INSTRUCTIONS = "Now answer the student's question naturally and helpfully, using the textbook content as your knowledge source. Make your answer conversational and focused on what they actually asked."
+
     def __init__(self):
         """Initialize Groq client"""
-        self.client = Groq(api_key=Config.GROQ_API_KEY)
+        self.client = get_groq_client()
         self.model = Config.GROQ_MODEL_PRIMARY
         self.fallback_model = Config.GROQ_MODEL_FALLBACK
 
-    def generate_answer(self, question: str, retrieved_docs: List[Dict]) -> Dict:
+    def generate_answer(self, question: str, retrieved_docs: List[Dict],
+                        use_retrieval: bool = True) -> Dict:
         """
         Generate user-focused answer using book content.
 
         Args:
             question: User question
             retrieved_docs: List of retrieved document chunks
+            use_retrieval: False to answer directly, without textbook context
 
         Returns:
             Dictionary with conversational answer and references
         """
-        # Remove duplicates
-        unique_docs = self._deduplicate_chunks(retrieved_docs)
+        # Deduplicate, build context and create user-focused prompt
+        prompt, unique_docs = self._prepare_prompt(question, retrieved_docs, use_retrieval)
 
-        # Build context
-        context = self._build_context(unique_docs)
-
-        # Create user-focused prompt
-        prompt = self._create_user_focused_prompt(question, context)
+        # References are the same on success and failure; build them once
+        references = self._create_references(unique_docs)
 
         try:
             response = self._call_groq(prompt, self.model)
@@ -47,76 +115,236 @@ class LLMChain:
                 response = self._call_groq(prompt, self.fallback_model)
             except Exception as e2:
                 print(f"Fallback also failed: {e2}")
-                return self._create_error_response(unique_docs)
+                return self._create_error_response(references)
 
         # Parse and format response
-        parsed = self._parse_response(response, unique_docs)
+        parsed = self._parse_response(response, references)
 
         return parsed
 
+    def generate_answer_stream(self, question: str, retrieved_docs: List[Dict],
+                               use_retrieval: bool = True) -> Iterator[Union[str, Dict]]:
+        """
+        Stream a user-focused answer as it is generated.
+
+        Args:
+            question: User question
+            retrieved_docs: List of retrieved document chunks
+            use_retrieval: False to answer directly, without textbook context
+
+        Yields:
+            Text deltas as they arrive, then the final response dictionary
+            (same shape as generate_answer)
+        """
+        prompt, unique_docs = self._prepare_prompt(question, retrieved_docs, use_retrieval)
+        references = self._create_references(unique_docs)
+
+        parts = []
+        for model in (self.model, self.fallback_model):
+            try:
+                for delta in self._call_groq_stream(prompt, model):
+                    parts.append(delta)
+                    yield delta
+                break
+            except Exception as e:
+                print(f"Streaming from {model} failed: {e}")
+                # Text already shown to the user can't be retracted; keep it
+                if parts:
+                    break
+        else:
+            yield self._create_error_response(references)
+            return
+
+        yield self._parse_response("".join(parts), references)
+
+    def generate_answers_batch(self, questions: List[str],
+                               retrieved_docs_list: List[List[Dict]]) -> List[Dict]:
+        """
+        Answer several questions with concurrent Groq requests.
+        Must be called from synchronous code (it runs its own event loop).
+
+        Args:
+            questions: User questions
+            retrieved_docs_list: Retrieved chunks for each question
+
+        Returns:
+            Response dictionaries in question order
+        """
+        async def run_all():
+            # The async HTTP pool is tied to this event loop, so it lives per batch
+            async with AsyncGroq(api_key=Config.require_key("GROQ_API_KEY")) as client:
+                return await asyncio.gather(*[
+                    self._generate_answer_async(client, question, docs)
+                    for question, docs in zip(questions, retrieved_docs_list)
+                ])
+
+        return list(asyncio.run(run_all()))
+
+    def submit_batch(self, questions: List[str], retrieved_docs_list: List[List[Dict]]) -> str:
+        """
+        Submit questions to Groq's Batch API for offline evaluation.
+
+        Args:
+            questions: User questions
+            retrieved_docs_list: Retrieved chunks for each question
+
+        Returns:
+            Groq batch ID; results are keyed by custom_id "q<index>"
+        """
+        lines = []
+        for i, (question, docs) in enumerate(zip(questions, retrieved_docs_list)):
+            prompt, _ = self._prepare_prompt(question, docs)
+            lines.append(json.dumps({
+                "custom_id": f"q{i}",
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {
+                    "model": self.model,
+                    "messages": self._build_messages(prompt),
+                    "temperature": 0.4,
+                    "max_tokens": Config.GROQ_MAX_TOKENS
+                }
+            }))
+
+        batch_file = self.client.files.create(
+            file=("questions.jsonl", "\n".join(lines).encode("utf-8")),
+            purpose="batch"
+        )
+        batch = self.client.batches.create(
+            completion_window="24h",
+            endpoint="/v1/chat/completions",
+            input_file_id=batch_file.id
+        )
+        return batch.id
+
+    async def _generate_answer_async(self, client: AsyncGroq, question: str,
+                                     retrieved_docs: List[Dict]) -> Dict:
+        """Async counterpart of generate_answer"""
+        prompt, unique_docs = self._prepare_prompt(question, retrieved_docs)
+        references = self._create_references(unique_docs)
+
+        try:
+            response = await self._call_groq_async(client, prompt, self.model)
+        except Exception as e:
+            print(f"Primary model failed, using fallback: {e}")
+            try:
+                response = await self._call_groq_async(client, prompt, self.fallback_model)
+            except Exception as e2:
+                print(f"Fallback also failed: {e2}")
+                return self._create_error_response(references)
+
+        return self._parse_response(response, references)
+
+    def _prepare_prompt(self, question: str, retrieved_docs: List[Dict],
+                        use_retrieval: bool = True) -> Tuple[str, List[Dict]]:
+        """Deduplicate docs and build the prompt; returns (prompt, unique_docs)"""
+        if not use_retrieval:
+            return self._create_direct_prompt(question), []
+        unique_docs = self._deduplicate_chunks(retrieved_docs)
+        context = self._build_context(unique_docs)
+        prompt = self._create_user_focused_prompt(question, context)
+
+        # Trim locally rather than let Groq reject an overlong prompt
+        budget = Config.GROQ_CONTEXT_WINDOW - Config.GROQ_MAX_TOKENS - Config.GROQ_PROMPT_MARGIN
+        excess = _count_tokens(prompt) - budget
+        if excess > 0:
+            unique_docs = self._trim_to_budget(unique_docs, excess)
+            context = self._build_context(unique_docs)
+            prompt = self._create_user_focused_prompt(question, context)
+
+        return prompt, unique_docs
+
+    def _trim_to_budget(self, docs: List[Dict], excess: int) -> List[Dict]:
+        """Drop the lowest-scoring docs until at least `excess` tokens are freed"""
+        by_score = sorted(
+            range(len(docs)),
+            key=lambda i: docs[i].get('rerank_score', docs[i].get('score', 0.0))
+        )
+        dropped = set()
+        for i in by_score:
+            if excess <= 0:
+                break
+            dropped.add(i)
+            excess -= _count_tokens(docs[i]['text'])
+        print(f"Prompt over token budget; dropped {len(dropped)} of {len(docs)} sources")
+        return [doc for i, doc in enumerate(docs) if i not in dropped]
+
     def _deduplicate_chunks(self, docs: List[Dict]) -> List[Dict]:
         """Remove duplicate chunks"""
         if not docs:
             return []
 
         unique = []
-        seen_texts = set()
+        seen_shingles = []
 
         for doc in docs:
-            text_normalized = ' '.join(doc['text'].lower().split()[:50])
-            if text_normalized not in seen_texts:
+            # Near-duplicates share most of their word 3-grams
+            shingles = _shingles(doc['text'])
+            if all(_jaccard(shingles, seen) < Config.CONTEXT_DEDUP_JACCARD for seen in seen_shingles):
                 unique.append(doc)
-                seen_texts.add(text_normalized)
+                seen_shingles.append(shingles)
+                if len(unique) == 10:
+                    break
 
-        return unique[:10]
+        return unique
 
     def _build_context(self, docs: List[Dict]) -> str:
         """Build context from retrieved documents"""
-        context_parts = []
+        buf = io.StringIO()
         for i, doc in enumerate(docs, 1):
-            context_parts.append(
-                f"[Source {i} - {doc['book']}, Page {doc['page']}]\n{doc['text']}\n"
-            )
-        return "\n".join(context_parts)
+            if i > 1:
+                buf.write("\n")
+            buf.write("[Source ")
+            buf.write(str(i))
+            buf.write(" - ")
+            buf.write(str(doc['book']))
+            buf.write(", Page ")
+            buf.write(str(doc['page']))
+            buf.write("]\n")
+            buf.write(doc['text'])
+            buf.write("\n")
+        return buf.getvalue()
 
     def _create_user_focused_prompt(self, question: str, context: str) -> str:
         """Create prompt that focuses on answering user's specific question"""
-        return f"""You are a helpful medical AI assistant. A student has asked you a question, and you have access to relevant medical textbook content to help answer it.
-
-Your task: Answer the student's question directly and conversationally, using the textbook content as your knowledge base.
-
-Guidelines:
-- Focus on answering EXACTLY what the student asked
-- Use a natural, conversational tone (like ChatGPT)
-- Draw facts and information from the textbook content below
-- If the student asks "what is X", explain what X is
-- If they ask "how to treat Y", explain treatment
-- If they ask "why does Z happen", explain the mechanism
-- Be helpful and educational, not rigid
-- If the textbook doesn't have the specific info they need, say so politely
-
-AVAILABLE TEXTBOOK CONTENT:
-{context}
+        # Static preamble first so every request shares a byte-identical prefix
+        return "".join([
+            self.TASK_PREAMBLE,
+            "\n\nAVAILABLE TEXTBOOK CONTENT:\n",
+            context,
+            "\n\nSTUDENT'S QUESTION: ",
+            question,
+            "\n\n",
+            self.FORMAT_INSTRUCTIONS
+        ])
 
-STUDENT'S QUESTION: {question}
+    def _create_direct_prompt(self, question: str) -> str:
+        """Create prompt for messages answered without retrieval"""
+        return "".join([
+            self.DIRECT_PREAMBLE,
+            "\n\nSTUDENT'S MESSAGE: ",
+            question
+        ])
 
-Now answer the student's question naturally and helpfully, using the textbook content as your knowledge source. Make your answer conversational and focused on what they actually asked."""
+    def _build_messages(self, prompt: str) -> List[Dict]:
+        """Chat messages for a prompt"""
+        return [
+            {
+                "role": "system",
+                "content": self.SYSTEM_PROMPT
+            },
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ]
 
     def _call_groq(self, prompt: str, model: str) -> str:
         """Call Groq API"""
         try:
             response = self.client.chat.completions.create(
                 model=model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are a friendly medical AI assistant helping students learn. Answer their questions naturally and conversationally using textbook knowledge. Focus on what they actually asked."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
+                messages=self._build_messages(prompt),
                 temperature=0.4,  # Balanced between creativity and accuracy
                 max_tokens=Config.GROQ_MAX_TOKENS
             )
@@ -125,27 +353,52 @@ Now answer the student's question naturally and helpfully, using the textbook co
             print(f"Groq API error: {str(e)}")
             raise
 
-    def _create_error_response(self, docs: List[Dict]) -> Dict:
+    async def _call_groq_async(self, client: AsyncGroq, prompt: str, model: str) -> str:
+        """Call Groq API without blocking the event loop"""
+        response = await client.chat.completions.create(
+            model=model,
+            messages=self._build_messages(prompt),
+            temperature=0.4,
+            max_tokens=Config.GROQ_MAX_TOKENS
+        )
+        return response.choices[0].message.content
+
+    def _call_groq_stream(self, prompt: str, model: str) -> Iterator[str]:
+        """Call Groq API with server-sent events, yielding text deltas"""
+        stream = self.client.chat.completions.create(
+            model=model,
+            messages=self._build_messages(prompt),
+            temperature=0.4,
+            max_tokens=Config.GROQ_MAX_TOKENS,
+            stream=True
+        )
+        for chunk in stream:
+            delta = chunk.choices[0].delta.content
+            if delta:
+                yield delta
+
+    def _create_error_response(self, references: List[Dict]) -> Dict:
         """Create fallback response on error"""
         return {
             'content': "I encountered an error generating a response. Please try rephrasing your question.",
-            'references': self._create_references(docs)
+            'references': references,
+            'error': True
         }
 
     def _create_references(self, docs: List[Dict]) -> List[Dict]:
         """Create reference list"""
-        references = []
-        for doc in docs[:5]:
-            references.append({
+        return [
+            {
                 'book': doc['book'],
                 'page': doc['page'],
-                'excerpt': doc['text'][:200] + "..." if len(doc['text']) > 200 else doc['text']
-            })
-        return references
+                'excerpt': f"{doc['text'][:200]}..." if len(doc['text']) > 200 else doc['text']
+            }
+            for doc in docs[:5]
+        ]
 
-    def _parse_response(self, response: str, docs: List[Dict]) -> Dict:
+    def _parse_response(self, response: str, references: List[Dict]) -> Dict:
         """Parse response into structured format"""
         return {
             'content': response.strip(),
-            'references': self._create_references(docs)
+            'references': references
         }
\ No newline at end of file
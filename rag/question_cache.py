@@ -0,0 +1,269 @@
+"""
+Semantic answer cache for repeated student questions.
+Exact (normalized) question matches are served from a dict; near-duplicates
+are matched by cosine similarity of question embeddings.
+"""
+
+import base64
+import json
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from embeddings._kernels import cos_sim_topk
+from utils.config import Config
+
+
+def read_corpus_version() -> str:
+    """Marker written by each completed ingestion ('' if there is none)"""
+    try:
+        return Path(Config.CORPUS_VERSION_PATH).read_text(encoding="utf-8").strip()
+    except OSError:
+        return ""
+
+
+def bump_corpus_version():
+    """Record a new corpus version so answers cached against the old one are dropped"""
+    path = Path(Config.CORPUS_VERSION_PATH)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(str(time.time_ns()), encoding="utf-8")
+    except OSError as e:
+        print(f"Failed to record corpus version: {e}")
+
+
+class QuestionCache:
+    """
+    Bounded, expiring cache of generated answers, persisted to disk.
+
+    Entries live in a ring of at most max_entries slots; once full, the
+    oldest answer is overwritten. Answers expire after ttl seconds and are
+    dropped wholesale when the ingested corpus changes. Disk writes are
+    appended to a JSONL log by a background thread, which compacts the log
+    once it holds twice as many lines as live entries.
+    """
+
+    _FILENAME = "entries.jsonl"
+
+    def __init__(self, cache_dir: Optional[str] = None, threshold: Optional[float] = None,
+                 max_entries: Optional[int] = None, ttl: Optional[float] = None):
+        """
+        Args:
+            cache_dir: Directory for persisted cache files (default: Config.QUESTION_CACHE_DIR)
+            threshold: Minimum cosine similarity for a semantic hit
+            max_entries: Maximum cached answers (default: Config.QUESTION_CACHE_MAX_ENTRIES)
+            ttl: Seconds an answer stays valid (default: Config.QUESTION_CACHE_TTL_SECONDS)
+        """
+        self.cache_dir = Path(cache_dir or Config.QUESTION_CACHE_DIR)
+        self.threshold = threshold if threshold is not None else Config.QUESTION_CACHE_THRESHOLD
+        self.max_entries = max_entries or Config.QUESTION_CACHE_MAX_ENTRIES
+        self.ttl = ttl if ttl is not None else Config.QUESTION_CACHE_TTL_SECONDS
+        self.corpus_version = ""
+
+        self._reset()
+        self._lock = threading.Lock()
+
+        # Single writer thread owns the log file
+        self._log_lines = 0
+        self._writes = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+        self._load()
+        self._writer.start()
+
+    def _reset(self):
+        """Empty the in-memory cache"""
+        self.exact: Dict[str, int] = {}
+        self.questions: List[Optional[str]] = []
+        self.responses: List[Optional[Dict]] = []
+        self.created: List[float] = []
+        self._vecs = np.empty((16, Config.PINECONE_DIMENSION), dtype=np.float32)
+        self._size = 0
+        self._oldest = 0
+
+    @staticmethod
+    def _normalize(question: str) -> str:
+        """Case- and whitespace-insensitive key"""
+        return ' '.join(question.lower().split())
+
+    def _fresh(self, slot: int) -> bool:
+        return time.time() - self.created[slot] < self.ttl
+
+    def check_version(self):
+        """Drop every cached answer if the corpus was re-ingested since it was built"""
+        corpus_version = read_corpus_version()
+        if corpus_version == self.corpus_version:
+            return
+        with self._lock:
+            self.corpus_version = corpus_version
+            self._reset()
+            self._compact()
+
+    def lookup_exact(self, question: str) -> Optional[Dict]:
+        """Return a cached response for the same question text, if any"""
+        with self._lock:
+            slot = self.exact.get(self._normalize(question))
+            if slot is not None and self._fresh(slot):
+                return self.responses[slot]
+        return None
+
+    def lookup(self, query_vector: List[float]) -> Optional[Dict]:
+        """
+        Return the cached response for the most similar question.
+
+        Args:
+            query_vector: Embedding of the new question
+
+        Returns:
+            Cached response if similarity exceeds the threshold, else None
+        """
+        with self._lock:
+            if not self._size:
+                return None
+
+            # A few candidates, in case the best match has expired
+            idx, sims = cos_sim_topk(query_vector, self._vecs[:self._size], 4)
+            for slot, sim in zip(idx, sims):
+                if sim <= self.threshold:
+                    break
+                if self._fresh(int(slot)):
+                    return self.responses[int(slot)]
+        return None
+
+    def add(self, question: str, query_vector: List[float], response: Dict):
+        """Store a generated response and queue it for persistence"""
+        vec = self._unit(query_vector)
+        now = time.time()
+        try:
+            line = json.dumps({
+                'question': question,
+                'vector': base64.b64encode(vec.tobytes()).decode('ascii'),
+                'response': response,
+                'created': now
+            })
+        except TypeError as e:
+            print(f"Failed to persist question cache entry: {e}")
+            line = None
+
+        with self._lock:
+            self._insert(question, vec, response, now)
+            if line is not None:
+                self._writes.put(('append', line))
+                self._log_lines += 1
+                if self._log_lines > 2 * self.max_entries:
+                    self._compact()
+
+    def _insert(self, question: str, vec: np.ndarray, response: Dict, created: float):
+        """Place an entry in the next free slot, or over the oldest one"""
+        if self._size < self.max_entries:
+            slot = self._size
+            if slot == len(self._vecs):
+                # Geometric growth keeps appends amortized O(1)
+                grown = np.empty((min(2 * slot, self.max_entries), self._vecs.shape[1]),
+                                 dtype=np.float32)
+                grown[:slot] = self._vecs[:slot]
+                self._vecs = grown
+            self._size += 1
+            self.questions.append(None)
+            self.responses.append(None)
+            self.created.append(0.0)
+        else:
+            slot = self._oldest
+            self._oldest = (slot + 1) % self.max_entries
+            old_key = self._normalize(self.questions[slot])
+            if self.exact.get(old_key) == slot:
+                del self.exact[old_key]
+
+        self._vecs[slot] = vec
+        self.questions[slot] = question
+        self.responses[slot] = response
+        self.created[slot] = created
+        self.exact[self._normalize(question)] = slot
+
+    @staticmethod
+    def _unit(vector: List[float]) -> np.ndarray:
+        vec = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def _header(self) -> str:
+        return json.dumps({'version': self.corpus_version, 'dim': Config.PINECONE_DIMENSION})
+
+    def _compact(self):
+        """Queue a rewrite of the log with only live entries (caller holds the lock)"""
+        # Oldest first, so a reload refills the ring in the same order
+        order = [(self._oldest + i) % self._size for i in range(self._size)] if self._size else []
+        lines = [self._header()]
+        for slot in order:
+            try:
+                lines.append(json.dumps({
+                    'question': self.questions[slot],
+                    'vector': base64.b64encode(self._vecs[slot].tobytes()).decode('ascii'),
+                    'response': self.responses[slot],
+                    'created': self.created[slot]
+                }))
+            except TypeError:
+                continue
+        self._writes.put(('rewrite', lines))
+        self._log_lines = len(lines) - 1
+
+    def _write_loop(self):
+        path = self.cache_dir / self._FILENAME
+        while True:
+            item = self._writes.get()
+            if item is None:
+                return
+            kind, payload = item
+            try:
+                self.cache_dir.mkdir(parents=True, exist_ok=True)
+                if kind == 'append':
+                    with open(path, "a", encoding="utf-8") as f:
+                        f.write(payload + "\n")
+                else:
+                    tmp = path.with_suffix(".tmp")
+                    with open(tmp, "w", encoding="utf-8") as f:
+                        f.write("\n".join(payload) + "\n")
+                    os.replace(tmp, path)
+            except OSError as e:
+                print(f"Failed to persist question cache: {e}")
+
+    def close(self):
+        """Flush pending writes and stop the writer thread"""
+        self._writes.put(None)
+        self._writer.join()
+
+    def _load(self):
+        path = self.cache_dir / self._FILENAME
+        if not path.exists():
+            self._compact()
+            return
+
+        try:
+            with open(path, encoding="utf-8") as f:
+                header = json.loads(f.readline())
+                records = [json.loads(line) for line in f if line.strip()]
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable question cache: {e}")
+            self._compact()
+            return
+
+        if header.get('dim') != Config.PINECONE_DIMENSION:
+            print("Ignoring inconsistent question cache")
+            self._compact()
+            return
+
+        self.corpus_version = header.get('version', "")
+        cutoff = time.time() - self.ttl
+        for record in records[-self.max_entries:]:
+            if record['created'] < cutoff:
+                continue
+            vec = np.frombuffer(base64.b64decode(record['vector']), dtype=np.float32)
+            self._insert(record['question'], vec, record['response'], record['created'])
+
+        self._log_lines = len(records)
+        if len(records) > self._size:
+            self._compact()
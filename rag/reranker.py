@@ -0,0 +1,59 @@
+"""
+Cross-encoder reranking of retrieved chunks.
+Scores (query, chunk) pairs jointly, which is more precise than comparing
+independently computed embeddings.
+"""
+
+from sentence_transformers import CrossEncoder
+from cachetools import LRUCache
+from typing import List, Dict, Optional
+from utils.config import Config
+import threading
+
+
+class CrossEncoderReranker:
+    """
+    Reorders candidate chunks by cross-encoder relevance score.
+    """
+
+    def __init__(self, model_name: Optional[str] = None):
+        """Load the cross-encoder once"""
+        model_name = model_name or Config.RERANK_MODEL
+        print(f"Loading reranker model: {model_name}")
+        self.model = CrossEncoder(model_name)
+
+        # Scores for recently seen (query, candidate IDs) pairs
+        self._scores = LRUCache(maxsize=256)
+        self._lock = threading.Lock()
+
+    def rerank(self, query: str, docs: List[Dict], top_k: int) -> List[Dict]:
+        """
+        Pick the most relevant documents.
+
+        Args:
+            query: User question
+            docs: Candidate chunks (with full 'text')
+            top_k: Number of documents to keep
+
+        Returns:
+            Top-k documents, best first, each with a 'rerank_score'
+        """
+        if not docs:
+            return []
+
+        key = (query, tuple(doc['id'] for doc in docs))
+        with self._lock:
+            scores = self._scores.get(key)
+
+        if scores is None:
+            scores = self.model.predict(
+                [(query, doc['text']) for doc in docs],
+                show_progress_bar=False
+            ).tolist()
+            with self._lock:
+                self._scores[key] = scores
+
+        for doc, score in zip(docs, scores):
+            doc['rerank_score'] = score
+
+        return sorted(docs, key=lambda doc: doc['rerank_score'], reverse=True)[:top_k]
@@ -4,9 +4,22 @@ Retrieval pipeline for fetching relevant document chunks.
 
 from vectorstore.pinecone_db import PineconeDB
 from embeddings.embedder import ChunkEmbedder
-from typing import List, Dict, Optional
+from embeddings.batched_embedder import BatchedEmbedder
+from rag.reranker import CrossEncoderReranker
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+from typing import List, Dict, Optional, Tuple
 from utils.config import Config
 
+# Small talk that gets a direct answer without touching the index
+GREETINGS = frozenset({
+    "hi", "hii", "hello", "hey", "hey there", "hello there", "yo", "sup",
+    "good morning", "good afternoon", "good evening",
+    "thanks", "thank you", "thank you so much", "thx", "ty",
+    "ok", "okay", "cool", "great", "nice", "bye", "goodbye", "test"
+})
+
 
 class RAGRetriever:
     """
@@ -16,21 +29,56 @@ class RAGRetriever:
     def __init__(self):
         """Initialize retriever components"""
         self.embedder = ChunkEmbedder()
+        self.query_embedder = BatchedEmbedder(self.embedder)
         self.vectorstore = PineconeDB()
+        self.reranker = CrossEncoderReranker() if Config.RERANK_ENABLED else None
+
+        # Repeated questions skip the embedding model entirely
+        self._lowercase = getattr(self.embedder.tokenizer, 'do_lower_case', False)
+        self._embed_cached = lru_cache(maxsize=1024)(self._embed_normalized)
 
-        # Verify index is populated
-        if not self.vectorstore.check_if_populated():
+        # Verify index is populated (skippable where ingestion is already verified)
+        if not Config.SKIP_POPULATED_CHECK and not self.vectorstore.check_if_populated():
             raise ValueError(
                 "Pinecone index is empty. Please run admin/ingest_books.py first."
             )
 
-    def retrieve(self, query: str, top_k: Optional[int] = None) -> List[Dict]:
+        # Without the local chunk store every match degrades to a short excerpt
+        if not Path(Config.CHUNK_STORE_PATH).exists() or self.vectorstore.chunk_store.count() == 0:
+            raise ValueError(
+                f"Chunk store {Config.CHUNK_STORE_PATH} is missing or empty. "
+                "Please run admin/ingest_books.py on this host or set CHUNK_STORE_PATH."
+            )
+
+    def embed_query(self, query: str) -> List[float]:
+        """Embed a query, reusing the result for repeated (normalized) queries"""
+        query_norm = ' '.join(query.split())
+        # Only fold case when the tokenizer would anyway, so hits are exact
+        if self._lowercase:
+            query_norm = query_norm.lower()
+        return list(self._embed_cached(query_norm))
+
+    def _embed_normalized(self, query_norm: str) -> Tuple[float, ...]:
+        return tuple(self.query_embedder.embed_query(query_norm))
+
+    @staticmethod
+    def needs_retrieval(query: str) -> bool:
+        """False for empty, single-character or greeting-only input"""
+        q = query.strip()
+        # Two letters is enough for abbreviations like "MI" or "TB"
+        if len(q) < 2:
+            return False
+        return ' '.join(q.lower().rstrip('!.?').split()) not in GREETINGS
+
+    def retrieve(self, query: str, top_k: Optional[int] = None,
+                 query_vector: Optional[List[float]] = None) -> List[Dict]:
         """
         Retrieve relevant documents for a query.
 
         Args:
             query: User question
             top_k: Number of documents to retrieve (default: Config.TOP_K)
+            query_vector: Precomputed query embedding, if the caller has one
 
         Returns:
             List of relevant document chunks
@@ -38,10 +86,63 @@ class RAGRetriever:
         if top_k is None:
             top_k = Config.TOP_K
 
+        # Trivial input: skip the embedding model and Pinecone entirely
+        if not self.needs_retrieval(query):
+            return []
+
         # Generate query embedding
-        query_vector = self.embedder.embed_query(query)
+        if query_vector is None:
+            query_vector = self.embed_query(query)
+
+        # Retrieve from Pinecone (a wider candidate set when reranking)
+        results = self.vectorstore.query(query_vector, top_k=self._candidate_count(top_k))
 
-        # Retrieve from Pinecone
-        results = self.vectorstore.query(query_vector, top_k=top_k)
+        return self._rerank(query, results, top_k)
+
+    def retrieve_many(self, queries: List[str], top_k: Optional[int] = None) -> List[List[Dict]]:
+        """
+        Retrieve documents for several queries at once.
+        Queries are embedded in a single batch and Pinecone is queried concurrently.
+
+        Args:
+            queries: User questions
+            top_k: Number of documents per query (default: Config.TOP_K)
+
+        Returns:
+            List of document lists, in query order
+        """
+        if not queries:
+            return []
+        if top_k is None:
+            top_k = Config.TOP_K
+
+        # Same short-circuit as retrieve(): trivial entries get no documents
+        wanted = [i for i, query in enumerate(queries) if self.needs_retrieval(query)]
+        results = [[] for _ in queries]
+        if not wanted:
+            return results
+
+        query_vectors = self.embedder.embed_queries([queries[i] for i in wanted])
+
+        candidates = self._candidate_count(top_k)
+        with ThreadPoolExecutor(max_workers=min(8, len(wanted))) as executor:
+            matches = executor.map(
+                lambda vector: self.vectorstore.query(vector, top_k=candidates),
+                query_vectors
+            )
+            for i, docs in zip(wanted, matches):
+                results[i] = self._rerank(queries[i], docs, top_k)
 
         return results
+
+    def _candidate_count(self, top_k: int) -> int:
+        """Number of Pinecone matches to fetch for a final top_k"""
+        if self.reranker is None:
+            return top_k
+        return top_k * Config.RERANK_CANDIDATE_MULTIPLIER
+
+    def _rerank(self, query: str, docs: List[Dict], top_k: int) -> List[Dict]:
+        """Narrow candidates to top_k with the cross-encoder, if enabled"""
+        if self.reranker is None:
+            return docs[:top_k]
+        return self.reranker.rerank(query, docs, top_k)
@@ -10,9 +10,14 @@ from pathlib import Path
 # Load environment variables
 load_dotenv()
 
+# Repository root, so local stores resolve the same from any working directory
+BASE_DIR = Path(__file__).resolve().parent.parent
+
 
 class Config:
-    """Central configuration class"""
+    """Central configuration class (namespace only; never instantiated)"""
+
+    __slots__ = ()
 
     # API Keys
     PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
@@ -21,36 +26,64 @@ class Config:
     # Pinecone Settings
     PINECONE_INDEX_NAME = os.getenv("PINECONE_INDEX_NAME", "medical-rag-aiims")
     PINECONE_DIMENSION = 384  # all-MiniLM-L6-v2 embedding dimension
-    PINECONE_METRIC = "cosine"
+    PINECONE_METRIC = "dotproduct"  # embeddings are unit-normalized, so this equals cosine
+    UPSERT_BATCH_SIZE = 100  # vectors per upsert request
+    UPSERT_CONCURRENCY = 16  # upsert requests in flight
 
     # Embedding Settings
     EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
-    CHUNK_SIZE = 1200
-    CHUNK_OVERLAP = 200
-    BATCH_SIZE = 64
+    CHUNK_SIZE = 512  # tokens, capped at the model's max_seq_length
+    CHUNK_OVERLAP = 64  # tokens
+    BATCH_SIZE = 256  # chunks embedded per ingestion step
+    EMBEDDING_QUANTIZE_CPU = True  # int8 dynamic quantization when running on CPU
+    EMBEDDING_COMPILE = True  # torch.compile the model when running on GPU
+    EMBEDDING_CPU_PROCESSES = int(os.getenv("EMBEDDING_CPU_PROCESSES", "4"))  # unquantized CPU only
+    EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", str(BASE_DIR / ".cache" / "embeddings.sqlite"))
 
     # Retrieval Settings
     TOP_K = 5
+    RERANK_ENABLED = True
+    RERANK_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+    RERANK_CANDIDATE_MULTIPLIER = 10  # Pinecone fetches TOP_K * this for reranking
+    QUERY_CACHE_TTL_SECONDS = 300
+    QUERY_BATCH_WINDOW_MS = 5  # Concurrent query embeddings are coalesced within this window
+    QUERY_BATCH_MAX = 8
+    # Full chunk text, written by admin/ingest_books.py. The serving host needs
+    # this file as well as Pinecone: ingest there or copy it over (gitignored)
+    CHUNK_STORE_PATH = os.getenv("CHUNK_STORE_PATH", str(BASE_DIR / ".cache" / "chunks.sqlite"))
+
+    # Question Cache Settings
+    QUESTION_CACHE_DIR = os.getenv("QUESTION_CACHE_DIR", str(BASE_DIR / ".cache" / "questions"))
+    QUESTION_CACHE_THRESHOLD = 0.95  # cosine similarity for a semantic hit
+    QUESTION_CACHE_MAX_ENTRIES = 5000  # oldest answers are evicted beyond this
+    QUESTION_CACHE_TTL_SECONDS = 7 * 24 * 3600
+    CORPUS_VERSION_PATH = os.getenv("CORPUS_VERSION_PATH", str(BASE_DIR / ".cache" / "corpus_version"))
 
     # LLM Settings
     GROQ_MODEL_PRIMARY = "llama-3.3-70b-versatile"
     GROQ_MODEL_FALLBACK = "llama-3.1-8b-instant"
     GROQ_MAX_TOKENS = 2048
+    GROQ_CONTEXT_WINDOW = 131072  # tokens shared by prompt and completion
+    GROQ_PROMPT_MARGIN = 1024  # headroom for the system prompt and tokenizer mismatch
+    CONTEXT_DEDUP_JACCARD = 0.8  # word 3-gram overlap at which two sources count as duplicates
     GROQ_TEMPERATURE = 0.3
 
     # System Settings
     MAX_PDF_SIZE_MB = 500
     STREAMING_ENABLED = True
+    SKIP_POPULATED_CHECK = os.getenv("SKIP_POPULATED_CHECK") == "1"
+
+    @classmethod
+    def require_key(cls, name: str) -> str:
+        """Return an API key, raising only when a client actually needs it"""
+        value = getattr(cls, name)
+        if not value:
+            raise ValueError(f"{name} not found in environment")
+        return value
 
     @classmethod
     def validate(cls):
         """Validate required configuration"""
-        if not cls.PINECONE_API_KEY:
-            raise ValueError("PINECONE_API_KEY not found in environment")
-        if not cls.GROQ_API_KEY:
-            raise ValueError("GROQ_API_KEY not found in environment")
+        cls.require_key("PINECONE_API_KEY")
+        cls.require_key("GROQ_API_KEY")
         return True
-
-
-# Validate on import
-Config.validate()
\ No newline at end of file
@@ -0,0 +1,80 @@
+"""
+Shared plumbing for the local SQLite side stores.
+Any database error is logged and treated as a miss, so a broken store
+degrades to recomputing or refetching instead of failing the caller.
+"""
+
+import sqlite3
+import threading
+from pathlib import Path
+from typing import List, Sequence, Tuple
+
+
+class SQLiteStore:
+    """
+    One SQLite connection shared across threads, plus batched lookups.
+    """
+
+    # Stay below SQLite's default host-parameter limit
+    _MAX_PARAMS = 900
+
+    def __init__(self, db_path: Path, schema: Sequence[str], label: str):
+        """
+        Args:
+            db_path: Path to SQLite file (parent directories are created)
+            schema: CREATE statements run on open
+            label: Name used in log messages, e.g. "Chunk store"
+        """
+        self.db_path = Path(db_path)
+        self.label = label
+        self.conn = None
+        self._lock = threading.Lock()
+
+        try:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            self.conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+            for statement in schema:
+                self.conn.execute(statement)
+            self.conn.commit()
+        except (OSError, sqlite3.Error) as e:
+            print(f"{label} disabled: {e}")
+            self.conn = None
+
+    def _select_in(self, query: str, keys: Sequence) -> List[Tuple]:
+        """
+        Run a SELECT whose "{placeholders}" slot is an IN list over keys,
+        in batches that respect the host-parameter limit.
+        """
+        if self.conn is None or not keys:
+            return []
+
+        rows = []
+        try:
+            with self._lock:
+                for i in range(0, len(keys), self._MAX_PARAMS):
+                    batch = list(keys[i:i + self._MAX_PARAMS])
+                    placeholders = ",".join("?" * len(batch))
+                    rows.extend(self.conn.execute(query.format(placeholders=placeholders), batch))
+        except sqlite3.Error as e:
+            print(f"{self.label} read failed: {e}")
+            return []
+
+        return rows
+
+    def _write_many(self, statement: str, rows: Sequence[Tuple]):
+        """executemany plus commit; failures are logged and dropped"""
+        if self.conn is None or not rows:
+            return
+
+        try:
+            with self._lock:
+                self.conn.executemany(statement, rows)
+                self.conn.commit()
+        except sqlite3.Error as e:
+            print(f"{self.label} write failed: {e}")
+
+    def close(self):
+        """Close the database connection"""
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
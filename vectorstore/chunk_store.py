@@ -0,0 +1,66 @@
+"""
+Local side store for full chunk text.
+Pinecone metadata only carries a short excerpt; the complete text is kept
+here keyed by vector ID and looked up after a query.
+"""
+
+import sqlite3
+from typing import Dict, List
+
+from utils.config import Config
+from utils.sqlite_store import SQLiteStore
+
+
+class ChunkStore(SQLiteStore):
+    """
+    SQLite table of (chunk ID, full text).
+    """
+
+    def __init__(self, db_path: str = None):
+        """
+        Args:
+            db_path: Path to SQLite file (default: Config.CHUNK_STORE_PATH)
+        """
+        super().__init__(
+            db_path or Config.CHUNK_STORE_PATH,
+            ["CREATE TABLE IF NOT EXISTS chunks (id TEXT PRIMARY KEY, text TEXT)"],
+            "Chunk store"
+        )
+
+    def put_many(self, chunks: List[Dict]):
+        """
+        Store full text for a batch of chunks.
+
+        Args:
+            chunks: Chunk dictionaries with 'id' and 'text'
+        """
+        self._write_many(
+            "INSERT OR REPLACE INTO chunks (id, text) VALUES (?, ?)",
+            [(chunk['id'], chunk['text']) for chunk in chunks]
+        )
+
+    def get_many(self, ids: List[str]) -> Dict[str, str]:
+        """
+        Fetch full text for chunk IDs.
+
+        Args:
+            ids: Vector IDs
+
+        Returns:
+            Mapping of ID to text for every ID found
+        """
+        return dict(self._select_in(
+            "SELECT id, text FROM chunks WHERE id IN ({placeholders})", ids
+        ))
+
+    def count(self) -> int:
+        """Number of stored chunks (0 if the store is unavailable)"""
+        if self.conn is None:
+            return 0
+
+        try:
+            with self._lock:
+                return self.conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+        except sqlite3.Error as e:
+            print(f"{self.label} read failed: {e}")
+            return 0
@@ -3,9 +3,14 @@ Pinecone vector database operations.
 Handles connection, indexing, and retrieval.
 """
 
-from pinecone import Pinecone, ServerlessSpec
+from pinecone import ServerlessSpec
 from typing import List, Dict, Optional
+from rag._clients import get_pinecone_client
 from utils.config import Config
+from vectorstore.chunk_store import ChunkStore
+from cachetools import TTLCache
+from collections import deque
+import threading
 import time
 
 class PineconeDB:
@@ -13,13 +18,24 @@ class PineconeDB:
     Wrapper for Pinecone operations.
     """
 
+    # Shared by all instances: once the index is known to hold vectors,
+    # later constructions skip the describe_index_stats round-trip
+    _populated_cache: Optional[bool] = None
+
     def __init__(self):
         """Initialize Pinecone connection"""
-        # Updated initialization for newer Pinecone versions
-        self.pc = Pinecone(api_key=Config.PINECONE_API_KEY)
+        self.pc = get_pinecone_client()
         self.index_name = Config.PINECONE_INDEX_NAME
         self.index = None
 
+        # Short-lived cache of query results for repeated questions
+        self._query_cache = TTLCache(maxsize=256, ttl=Config.QUERY_CACHE_TTL_SECONDS)
+        self._query_cache_lock = threading.Lock()
+        self._stats_cache = TTLCache(maxsize=1, ttl=30)
+
+        # Full chunk text, opened on first use (ingestion never needs it)
+        self._chunk_store = None
+
         # Create index if doesn't exist
         self._setup_index()
 
@@ -40,28 +56,56 @@ class PineconeDB:
                 spec=ServerlessSpec(
                     cloud='aws',
                     region='us-east-1'
-                )
+                ),
+                timeout=-1  # return immediately; the client's own wait polls every 5s
             )
             # Wait for index to be ready
             print("Waiting for index to be ready...")
-            time.sleep(10)
+            deadline = time.time() + 30
+            while time.time() < deadline:
+                if self.pc.describe_index(self.index_name).status['ready']:
+                    break
+                time.sleep(0.5)
+            else:
+                print("⚠️ Index not ready after 30s; continuing anyway")
+        else:
+            metric = self.pc.describe_index(self.index_name).metric
+            if metric != Config.PINECONE_METRIC:
+                print(
+                    f"⚠️ Index metric is '{metric}' but config expects "
+                    f"'{Config.PINECONE_METRIC}'. Run admin/ingest_books.py --rebuild."
+                )
 
+        # gRPC index; async_req upserts return futures multiplexed over one channel
         self.index = self.pc.Index(self.index_name)
         print(f"✅ Connected to index: {self.index_name}")
 
-    def upsert_vectors(self, vectors: List[Dict], batch_size: int = 100):
+    def upsert_vectors(self, vectors: List[Dict], batch_size: Optional[int] = None,
+                       max_in_flight: Optional[int] = None):
         """
-        Upload vectors to Pinecone in batches.
+        Upload vectors to Pinecone in concurrent batches.
 
         Args:
             vectors: List of vector dictionaries
-            batch_size: Batch size for upload
+            batch_size: Batch size for upload (default: Config.UPSERT_BATCH_SIZE)
+            max_in_flight: Maximum concurrent upsert requests (default: Config.UPSERT_CONCURRENCY)
         """
+        batch_size = batch_size or Config.UPSERT_BATCH_SIZE
+        max_in_flight = max_in_flight or Config.UPSERT_CONCURRENCY
+
+        in_flight = deque()
         for i in range(0, len(vectors), batch_size):
+            if len(in_flight) >= max_in_flight:
+                in_flight.popleft().result()
+
             batch = vectors[i:i + batch_size]
-            self.index.upsert(vectors=batch)
+            in_flight.append(self.index.upsert(vectors=batch, async_req=True))
 
-        print(f"✅ Upserted {len(vectors)} vectors")
+        # Surface any upload error
+        for request in in_flight:
+            request.result()
+
+        self._stats_cache.clear()
 
     def query(self, query_vector: List[float], top_k: int = 5) -> List[Dict]:
         """
@@ -74,41 +118,91 @@ class PineconeDB:
         Returns:
             List of matched documents with metadata
         """
+        cache_key = (tuple(round(v, 6) for v in query_vector), top_k)
+        with self._query_cache_lock:
+            cached = self._query_cache.get(cache_key)
+        if cached is not None:
+            return [dict(doc) for doc in cached]
+
         results = self.index.query(
             vector=query_vector,
             top_k=top_k,
             include_metadata=True
         )
 
+        # Pinecone only carries a short excerpt; full text comes from the local store
+        matches = results['matches']
+        full_texts = self.chunk_store.get_many([match['id'] for match in matches])
+        missing = len(matches) - len(full_texts)
+        if missing:
+            print(f"⚠️ {missing} of {len(matches)} matches missing from chunk store; using excerpts")
+
         # Format results
         docs = []
-        for match in results['matches']:
+        for match in matches:
+            metadata = match['metadata']
+            # Vectors ingested before the excerpt change still carry 'text'
+            text = full_texts.get(match['id']) or metadata.get('text') or metadata.get('excerpt', '')
             docs.append({
                 'id': match['id'],
                 'score': match['score'],
-                'text': match['metadata'].get('text', ''),
-                'book': match['metadata'].get('book', ''),
-                'page': match['metadata'].get('page', 0),
-                'paragraph': match['metadata'].get('paragraph', 0)
+                'text': text,
+                'book': metadata.get('book', ''),
+                'page': metadata.get('page', 0),
+                'paragraph': metadata.get('paragraph', 0)
             })
 
+        with self._query_cache_lock:
+            self._query_cache[cache_key] = [dict(doc) for doc in docs]
+
         return docs
 
+    @property
+    def chunk_store(self) -> ChunkStore:
+        """Local store of full chunk text"""
+        if self._chunk_store is None:
+            self._chunk_store = ChunkStore()
+        return self._chunk_store
+
     def get_index_stats(self) -> Dict:
-        """Get index statistics"""
+        """Get index statistics (cached for 30 seconds)"""
+        stats = self._stats_cache.get('stats')
+        if stats is not None:
+            return stats
+
         stats = self.index.describe_index_stats()
         # Handle both dict and object responses
         if hasattr(stats, 'total_vector_count'):
-            return {'total_vector_count': stats.total_vector_count}
+            stats = {'total_vector_count': stats.total_vector_count}
+        self._stats_cache['stats'] = stats
         return stats
 
+    def _invalidate_stats(self):
+        """Forget cached stats after the index contents change"""
+        self._stats_cache.clear()
+        PineconeDB._populated_cache = None
+
+    def recreate_index(self):
+        """Drop the index and create it again with the configured dimension and metric"""
+        self.pc.delete_index(self.index_name)
+        self._invalidate_stats()
+        print(f"✅ Deleted index: {self.index_name}")
+        self._setup_index()
+
     def delete_all(self):
         """Delete all vectors from index"""
         self.index.delete(delete_all=True)
+        self._invalidate_stats()
         print("✅ Deleted all vectors from index")
 
     def check_if_populated(self) -> bool:
         """Check if index has vectors"""
+        if PineconeDB._populated_cache is not None:
+            return PineconeDB._populated_cache
+
         stats = self.get_index_stats()
         count = stats.get('total_vector_count', 0)
+        # Only remember a populated index; an empty one may be ingested later
+        if count > 0:
+            PineconeDB._populated_cache = True
         return count > 0
\ No newline at end of file